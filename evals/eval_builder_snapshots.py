@@ -18,16 +18,24 @@ NO HALLUCINATION - validation is based on real observed changes.
 import asyncio
 import argparse
 import os
+import re
 import sys
 import yaml
 import requests
+from requests.adapters import HTTPAdapter
 import time
+import signal
 import subprocess
 import json
-from lxml.html.clean import Cleaner
+import copy
+import hashlib
+import lxml.html
+from lxml import etree
+from collections import OrderedDict
+from lxml.html import defs as html_defs
+from urllib.parse import unquote_plus
 from pathlib import Path
-from typing import Dict, Any, Optional, List
-from difflib import unified_diff
+from typing import Dict, Any, Optional, List, Set, Tuple
 
 # Import DOM comparison package
 from dom import (
@@ -39,6 +47,282 @@ from dom import (
     DOMChange
 )
 
+try:
+    # C implementation of difflib.SequenceMatcher (same API)
+    from cdifflib import CSequenceMatcher as SequenceMatcher
+except ImportError:
+    from difflib import SequenceMatcher
+
+try:
+    # libyaml C bindings are several times faster than the pure-Python implementation
+    from yaml import CSafeDumper as SafeDumper
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeDumper, SafeLoader
+
+try:
+    import esprima
+    ESPRIMA_AVAILABLE = True
+except ImportError:
+    ESPRIMA_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# Change types shown first in console output and the Claude request summary
+CHANGE_PRIORITY_TYPES = (
+    ChangeType.FORM_VALUE_CHANGED,
+    ChangeType.CHECKBOX_STATE_CHANGED,
+    ChangeType.OPTION_SELECTED_CHANGED,
+    ChangeType.NODE_ADDED,
+    ChangeType.NODE_REMOVED,
+    ChangeType.TEXT_CHANGED,
+    ChangeType.ATTR_MODIFIED,
+)
+
+# Parsed eval files keyed by path -> (mtime, size, data), bounded LRU
+YAML_CACHE_MAX_ENTRIES = 100
+_yaml_cache: OrderedDict[str, Tuple[float, int, Any]] = OrderedDict()
+
+# Directories already created by _ensure_dir in this process
+_created_dirs: Set[str] = set()
+
+# On-disk cache of BEFORE HTML captures (used with --reuse-snapshot)
+SNAPSHOT_CACHE_DIR = Path.home() / '.cache' / 'eval_builder'
+SNAPSHOT_CACHE_MAX_AGE = 15 * 60  # seconds
+SNAPSHOT_CACHE_ZSTD_LEVEL = 3
+
+# Pages larger than this (characters of HTML) skip before/after.html and diff.json;
+# filtering and diffing them costs seconds and changes.json already covers the analysis
+HTML_ARTIFACT_MAX_CHARS = 2_000_000
+
+# Connect timeout (seconds) for the local API server; a down server fails fast
+# instead of consuming the whole read timeout
+API_CONNECT_TIMEOUT = 1
+
+# Pooled connections to the API server; also caps concurrent regression executions
+API_POOL_MAXSIZE = 8
+
+# Seconds a Claude Code run may take before it is killed
+CLAUDE_TIMEOUT = 300
+
+# Console separators
+RULE = "─" * 60
+BANNER_RULE = "=" * 80
+
+# Defaults filled into eval files on save (existing values always win)
+EVAL_DEFAULTS = {'enabled': True, 'tool': 'action_agent', 'timeout': 60000}
+EVAL_TARGET_DEFAULTS = {'wait_for': 'networkidle', 'wait_timeout': 5000}
+
+# Starting point for new eval files
+EMPTY_EVAL_TEMPLATE = {
+    'id': '',
+    'name': '',
+    'description': '',
+    'enabled': True,
+    'target': {'url': '', 'wait_for': 'networkidle', 'wait_timeout': 5000},
+    'tool': 'action_agent',
+    'timeout': 60000,
+    'input': {'objective': ''},
+    'validation': {
+        'type': 'js-eval',
+        'js-eval': {'script': '', 'expected_result': True, 'timeout': 5000}
+    }
+}
+
+
+# Request-file section listing the HTML artifacts; left out when step 7 skipped them
+CLAUDE_REQUEST_HTML_SECTION = """### Supplementary (Optional)
+- **BEFORE HTML**: {before_html_file} - HTML for manual inspection
+- **AFTER HTML**: {after_html_file} - HTML for manual inspection
+- **HTML DIFF**: {diff_file} - Element-level HTML diff (`+` added, `-` removed, `~` edited)
+
+"""
+
+# Instructions handed to Claude Code in step 7 (rendered with str.format_map)
+CLAUDE_REQUEST_TEMPLATE = """# Claude Code: Generate Validation JavaScript
+
+## Objective
+{objective}
+
+## Task
+Analyze the DOM changes and generate JavaScript validation code.
+
+## Files to Analyze
+
+### Primary Analysis (Semantic Changes)
+- **CHANGES**: {changes_file} - Structured semantic changes
+- **BEFORE**: {before_snapshot_file} - DOM snapshot before action (for reference)
+- **AFTER**: {after_snapshot_file} - DOM snapshot after action (for reference)
+
+{html_artifacts_section}## Detected Changes Summary
+
+{change_summary}
+
+## Change Types Explained
+
+- `form_value_changed`: Input/textarea value changed
+- `checkbox_state_changed`: Checkbox/radio checked state changed
+- `option_selected_changed`: Select option selected state changed
+- `node_added`: New element appeared in DOM
+- `node_removed`: Element removed from DOM
+- `text_changed`: Text content changed
+- `attr_modified`: Attribute value changed
+- `attr_added`: New attribute added
+- `attr_removed`: Attribute removed
+- `position_changed`: Element position/size changed
+- `style_changed`: Computed styles changed
+
+## Instructions
+
+1. **Read the changes.json file** - This contains structured semantic changes
+2. **Identify the specific changes** that indicate the objective was completed
+3. **Generate JavaScript validation code** that:
+   - Checks if the objective was completed successfully
+   - **CRITICAL: DO NOT use `return` statements - end with a boolean expression**
+   - Is based on ACTUAL observed changes (from changes.json)
+   - Works in the browser context
+   - Focuses on the most significant/reliable changes
+
+## CRITICAL: Output Format
+
+**DO NOT USE RETURN STATEMENTS!** The code is evaluated as an expression, not a function.
+
+❌ WRONG:
+```javascript
+return document.querySelector('#success') !== null;
+```
+
+✅ CORRECT:
+```javascript
+// Check for the specific change
+const element = document.querySelector('...');
+element && element.value === 'expected'
+```
+
+The last line should be a boolean expression (no return keyword).
+
+## Testing Your Code
+
+**YOU MUST TEST YOUR CODE ON BOTH TABS** before declaring it complete.
+
+**Endpoint:** POST http://localhost:8080/page/execute
+
+**Browser State Information:**
+- **Client ID:** {client_id}
+- **Tab ID (AFTER - task completed):** {tab_id}
+- **Tab ID (BEFORE - initial state):** {tab_id_before}
+
+**Test 1: AFTER Tab (Should Return TRUE):**
+```bash
+curl -X POST http://localhost:8080/page/execute \\
+  -H "Content-Type: application/json" \\
+  -d '{{
+    "clientId": "{client_id}",
+    "tabId": "{tab_id}",
+    "expression": "YOUR_JAVASCRIPT_CODE_HERE",
+    "returnByValue": true,
+    "awaitPromise": false
+  }}'
+```
+
+**Expected Response:** `{{"result": {{"value": true}}}}`
+
+**Test 2: BEFORE Tab (Should Return FALSE):**
+```bash
+curl -X POST http://localhost:8080/page/execute \\
+  -H "Content-Type: application/json" \\
+  -d '{{
+    "clientId": "{client_id}",
+    "tabId": "{tab_id_before}",
+    "expression": "YOUR_JAVASCRIPT_CODE_HERE",
+    "returnByValue": true,
+    "awaitPromise": false
+  }}'
+```
+
+**Expected Response:** `{{"result": {{"value": false}}}}`
+
+**CRITICAL:** Your validation MUST:
+- Return TRUE on the AFTER tab (task completed)
+- Return FALSE on the BEFORE tab (task not done)
+- This proves your validation correctly detects the change
+
+**Error Response:**
+```json
+{{
+  "exceptionDetails": {{ "text": "Error message here" }}
+}}
+```
+
+## Workflow
+
+1. Read changes.json to understand what changed
+2. Write validation code to: {snapshot_dir}/verify.js
+3. Test it on the AFTER tab (should return TRUE)
+4. Test it on the BEFORE tab (should return FALSE)
+5. If you get errors or wrong results:
+   - Read the existing {snapshot_dir}/verify.js
+   - Identify the issue from the API error response
+   - Edit and fix the file
+   - Save the improved version
+   - Test BOTH tabs again
+6. Iterate until:
+   - AFTER tab returns {{"result": {{"value": true}}}}
+   - BEFORE tab returns {{"result": {{"value": false}}}}
+7. Only then is your code complete
+
+## Save Your Response
+When you generate WORKING validation JavaScript (tested via API), save it to:
+{snapshot_dir}/verify.js
+
+The orchestrator will automatically pick it up and test it again for confirmation.
+
+**IMPORTANT:** The file will NOT be deleted between iterations. You can read it,
+learn from previous attempts, and improve it iteratively.
+"""
+
+
+def _intern_keys(obj: Any) -> Any:
+    """
+    Recursively intern the string keys of YAML-loaded mappings.
+
+    Keys such as 'target', 'input' and 'objective' then share the same object
+    as the builder's literals, so dict lookups hit CPython's identity fast path.
+    """
+    if isinstance(obj, dict):
+        return {sys.intern(k) if isinstance(k, str) else k: _intern_keys(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_intern_keys(v) for v in obj]
+    return obj
+
+
+def load_yaml_cached(path: str) -> Any:
+    """
+    Load a YAML file, reusing the parsed result while the file is unchanged.
+
+    Entries are validated against the file's mtime and size. A deep copy is
+    returned so callers can mutate the result without corrupting the cache;
+    mapping keys are interned once at load time and shared by every copy.
+    """
+    st = os.stat(path)
+    cached = _yaml_cache.get(path)
+    if cached and cached[0] == st.st_mtime and cached[1] == st.st_size:
+        _yaml_cache.move_to_end(path)
+        return copy.deepcopy(cached[2])
+
+    with open(path, 'r') as f:
+        data = _intern_keys(yaml.load(f, Loader=SafeLoader))
+
+    _yaml_cache[path] = (st.st_mtime, st.st_size, data)
+    _yaml_cache.move_to_end(path)
+    while len(_yaml_cache) > YAML_CACHE_MAX_ENTRIES:
+        _yaml_cache.popitem(last=False)
+    return copy.deepcopy(data)
+
 
 class ExampleManager:
     """Manages persistent storage of examples for extend mode."""
@@ -67,8 +351,7 @@ class ExampleManager:
         baseline_dir = os.path.join(self.examples_dir, 'baseline')
         os.makedirs(baseline_dir, exist_ok=True)
         snapshot_path = os.path.join(baseline_dir, 'snapshot.json')
-        with open(snapshot_path, 'w') as f:
-            json.dump(snapshot, f, indent=2)
+        _write_json(snapshot_path, snapshot, indent=None)
         self.index['baseline'] = {
             'client_id': client_id,
             'tab_id': tab_id,
@@ -92,8 +375,7 @@ class ExampleManager:
         snapshot_path = os.path.join(example_dir, 'snapshot.json')
         changes_path = os.path.join(example_dir, 'changes.json')
 
-        with open(snapshot_path, 'w') as f:
-            json.dump(snapshot, f, indent=2)
+        _write_json(snapshot_path, snapshot, indent=None)
 
         # Convert DOMChange objects to dicts if needed
         changes_data = []
@@ -143,9 +425,42 @@ class ExampleManager:
             return json.load(f)
 
 
+# filter_html_tags rules. These reproduce what lxml.html.clean.Cleaner(scripts=True,
+# javascript=True, style=True, inline_style=True, safe_attrs_only=True, frames=False,
+# forms=False) removes, applied in a single pass over the tree.
+HTML_DROP_TAGS = frozenset({
+    'script', 'style', 'link', 'meta', 'base', 'applet',
+    etree.Comment, etree.ProcessingInstruction
+})  # removed together with their content
+HTML_UNWRAP_TAGS = frozenset({
+    'html', 'head', 'title', 'iframe', 'embed', 'layer', 'object', 'param', 'blink', 'marquee'
+})  # tag removed, content kept
+HTML_KNOWN_TAGS = frozenset(html_defs.tags)  # anything else is unwrapped too
+HTML_SAFE_ATTRS = frozenset(html_defs.safe_attrs)  # excludes on* handlers and style
+HTML_LINK_ATTRS = frozenset(html_defs.link_attrs) & HTML_SAFE_ATTRS
+
+_url_whitespace_sub = re.compile(r'[\s\x00-\x08\x0B\x0C\x0E-\x19]+').sub
+_url_schemes_findall = re.compile(
+    r'(javascript|jscript|livescript|vbscript|data|about|mocha):', re.I
+).findall
+_image_dataurls_findall = re.compile(r'data:image/(.+?);base64,', re.I).findall
+_unsafe_image_type_search = re.compile(r'(xml|svg)', re.I).search
+
+
+def _is_script_url(url: str) -> bool:
+    """Return True if a link attribute value could execute script (e.g. "java script:...")."""
+    url = _url_whitespace_sub('', unquote_plus(url.strip()))
+    safe_images = 0
+    for image_type in _image_dataurls_findall(url):
+        if _unsafe_image_type_search(image_type):
+            return True
+        safe_images += 1
+    return len(_url_schemes_findall(url)) > safe_images
+
+
 def filter_html_tags(html: str) -> str:
     """
-    Clean HTML using lxml.html.Cleaner.
+    Clean HTML in one pass over the parsed tree.
     Removes scripts, styles, and unsafe attributes while preserving DOM structure.
 
     Args:
@@ -154,36 +469,454 @@ def filter_html_tags(html: str) -> str:
     Returns:
         Cleaned HTML string
     """
-    cleaner = Cleaner(
-        scripts=True,          # drop <script> elements
-        javascript=True,       # remove on* event attributes (like onclick)
-        style=True,            # drop <style> blocks
-        inline_style=True,     # drop style="" attributes on tags
-        safe_attrs_only=True,  # remove any tag attributes not in a safe allowlist
-        frames=False,          # keep <iframe> elements (content already captured by API)
-        forms=False            # keep <form> elements
-    )
     try:
-        cleaned_html = cleaner.clean_html(html)
-        return cleaned_html
+        root = lxml.html.fromstring(html)
+        if root.tag == 'image':
+            root.tag = 'img'
+
+        # The root itself can't be dropped or unwrapped; turn it into a plain <div>
+        if root.tag in HTML_DROP_TAGS:
+            root.clear()
+            root.tag = 'div'
+            return lxml.html.tostring(root, encoding='unicode')
+        if root.tag in HTML_UNWRAP_TAGS or root.tag not in HTML_KNOWN_TAGS:
+            root.tag = 'div'
+            root.attrib.clear()
+
+        # Dropped subtrees go first (in C), so the Python pass below skips them
+        etree.strip_elements(root, *HTML_DROP_TAGS, with_tail=False)
+
+        unknown_tags = set()
+        for el in root.iter(etree.Element):
+            tag = el.tag
+            if tag == 'image':
+                el.tag = tag = 'img'
+
+            attrib = el.attrib
+            for name in attrib.keys():
+                if name not in HTML_SAFE_ATTRS:
+                    del attrib[name]
+                elif name in HTML_LINK_ATTRS and _is_script_url(attrib[name]):
+                    attrib[name] = ''
+
+            if tag not in HTML_KNOWN_TAGS:
+                unknown_tags.add(tag)
+
+        etree.strip_tags(root, *HTML_UNWRAP_TAGS, *unknown_tags)
+
+        return lxml.html.tostring(root, encoding='unicode')
     except Exception as e:
         print(f"⚠️  Warning: HTML cleaning failed ({e}), using original HTML")
         return html
 
 
+# Elements ignored by the HTML diff (never meaningful for validation)
+DIFF_SKIP_TAGS = frozenset({'script', 'style'})
+
+# Attributes that identify an element - nodes that disagree on any of these never match
+DIFF_IDENTITY_ATTRS = ('id', 'src', 'name')
+
+# Minimum similarity for two nodes to be reported as "edited" rather than removed + added
+DIFF_MATCH_THRESHOLD = 0.75
+
+# Maximum text length stored per diff record
+DIFF_TEXT_LIMIT = 200
+
+
+def _diff_children(el) -> list:
+    """Element children of a node, skipping comments and DIFF_SKIP_TAGS."""
+    return [c for c in el if isinstance(c.tag, str) and c.tag not in DIFF_SKIP_TAGS]
+
+
+def _diff_own_text(el) -> str:
+    """Whitespace-normalized text directly owned by a node (its text plus child tails)."""
+    parts = [el.text or '']
+    parts.extend(c.tail or '' for c in el)
+    return ' '.join(' '.join(parts).split())
+
+
+def _diff_subtree_text(el) -> str:
+    """Whitespace-normalized text of a whole subtree, truncated to DIFF_TEXT_LIMIT."""
+    text = ' '.join(el.text_content().split())
+    return text[:DIFF_TEXT_LIMIT]
+
+
+def _diff_signature(el) -> tuple:
+    """Hashable key used to align sibling lists before pairwise comparison."""
+    return (el.tag, el.get('id'), el.get('name'), el.get('src'), el.get('class'))
+
+
+def _diff_features(el) -> tuple:
+    """
+    Precompute the values compared by _node_similarity for one node.
+
+    Returns:
+        (tag, identity attr values, own text, class tokens, other attribute items)
+    """
+    attrib = el.attrib
+    return (
+        el.tag,
+        tuple(attrib.get(attr) for attr in DIFF_IDENTITY_ATTRS),
+        _diff_own_text(el),
+        frozenset((attrib.get('class') or '').split()),
+        frozenset(kv for kv in attrib.items() if kv[0] != 'class')
+    )
+
+
+def _overlap(x: frozenset, y: frozenset) -> float:
+    """Jaccard overlap of two sets (1.0 when both are empty)."""
+    union = len(x | y)
+    return len(x & y) / union if union else 1.0
+
+
+def _node_similarity(fa: tuple, fb: tuple) -> float:
+    """
+    Score how likely two nodes are the same element (0.0 - 1.0).
+
+    Takes the _diff_features() of both nodes. Nodes with a different tag or
+    identity attribute (id/src/name) are disqualified. Otherwise the score
+    combines own text, class tokens and remaining attributes.
+    """
+    if fa[0] != fb[0] or fa[1] != fb[1]:
+        return 0.0
+    text_score = 1.0 if fa[2] == fb[2] else 0.0
+    return 0.5 * text_score + 0.25 * _overlap(fa[3], fb[3]) + 0.25 * _overlap(fa[4], fb[4])
+
+
+def _dom_diff_files(before_path: str, after_path: str) -> List[Dict[str, Any]]:
+    """
+    Compute an element-level diff between two UTF-8 HTML files.
+
+    Both documents are parsed with lxml and walked root-to-leaf. Sibling lists are
+    aligned on unchanged subtrees first, then by element signature, and unaligned
+    nodes are paired by similarity (see _node_similarity). Script/style elements
+    and whitespace-only text are ignored. lxml reads the files itself, so callers
+    can release their in-memory copies of large documents before the diff runs.
+
+    Args:
+        before_path: HTML file captured before the action
+        after_path: HTML file captured after the action
+
+    Returns:
+        List of records in document order: {'op': '+'|'-'|'~', 'xpath': ..., 'attrs': ...,
+        'text': ...}. Added/removed records carry the node's attributes and subtree text;
+        edited records carry only the changed attributes/text as [before, after] pairs.
+    """
+    parser = lxml.html.HTMLParser(encoding='utf-8')
+    try:
+        before_root = lxml.html.parse(before_path, parser).getroot()
+        after_root = lxml.html.parse(after_path, parser).getroot()
+    except Exception as e:
+        print(f"⚠️  Warning: HTML diff failed ({e})")
+        return []
+    if before_root is None or after_root is None:
+        print("⚠️  Warning: HTML diff failed (Document is empty)")
+        return []
+    return _diff_trees(before_root, after_root)
+
+
+def _subtree_fingerprints(root) -> Dict[Any, int]:
+    """
+    Compute a Merkle-style fingerprint for every element subtree in one post-order pass.
+
+    A node's fingerprint hashes its tag, attributes, raw text and its children's
+    (fingerprint, tail) pairs, so equal fingerprints mean identical subtrees. Raw
+    (not whitespace-normalized) text keeps this cheap; a whitespace-only mismatch
+    just falls back to the detailed comparison.
+    """
+    fingerprints: Dict[Any, int] = {}
+    get = fingerprints.get
+    for _, el in etree.iterwalk(root, events=('end',)):
+        fingerprints[el] = hash((
+            el.tag,
+            tuple(el.attrib.items()),
+            el.text,
+            tuple((get(c), c.tail) for c in el)
+        ))
+    return fingerprints
+
+
+def _diff_trees(before_root, after_root) -> List[Dict[str, Any]]:
+    """Walk two parsed documents and collect diff records (see _dom_diff_files)."""
+    # Identical subtrees are pruned without descending into them
+    fp_before = _subtree_fingerprints(before_root)
+    fp_after = _subtree_fingerprints(after_root)
+
+    # Bind hot lookups once
+    before_path = before_root.getroottree().getpath
+    after_path = after_root.getroottree().getpath
+    records: List[Dict[str, Any]] = []
+    emit = records.append
+    features = _diff_features
+    similarity = _node_similarity
+    threshold = DIFF_MATCH_THRESHOLD
+
+    def added(el):
+        emit({
+            'op': '+', 'xpath': after_path(el),
+            'attrs': dict(el.attrib), 'text': _diff_subtree_text(el)
+        })
+
+    def removed(el):
+        emit({
+            'op': '-', 'xpath': before_path(el),
+            'attrs': dict(el.attrib), 'text': _diff_subtree_text(el)
+        })
+
+    def pair_siblings(children_a, children_b, pending):
+        """Align changed siblings by signature, then pair leftovers by similarity."""
+        matcher = SequenceMatcher(
+            None,
+            [_diff_signature(c) for c in children_a],
+            [_diff_signature(c) for c in children_b],
+            autojunk=False
+        )
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                pending.extend(zip(children_a[i1:i2], children_b[j1:j2]))
+                continue
+
+            # Features are computed once per node, not once per candidate pair
+            unmatched_a = [(c, features(c)) for c in children_a[i1:i2]]
+            for child_b in children_b[j1:j2]:
+                fb = features(child_b)
+                best, best_score = None, threshold
+                for candidate in unmatched_a:
+                    # Strict comparison: the earliest of equally similar candidates wins
+                    score = similarity(candidate[1], fb)
+                    if score > best_score or (best is None and score == threshold):
+                        best, best_score = candidate, score
+                if best is None:
+                    pending.append((None, child_b))
+                else:
+                    unmatched_a.remove(best)
+                    pending.append((best[0], child_b))
+            pending.extend((child_a, None) for child_a, _ in unmatched_a)
+
+    # Iterative walk (avoids recursion limits on deep pages). Stack items are
+    # matched pairs, or (None, el) / (el, None) for added / removed nodes, so
+    # records come out in document order.
+    stack = [(before_root, after_root)]
+    while stack:
+        a, b = stack.pop()
+        if a is None:
+            added(b)
+            continue
+        if b is None:
+            removed(a)
+            continue
+        if fp_before[a] == fp_after[b]:
+            continue
+
+        # Report edits on the matched pair itself
+        edit: Dict[str, Any] = {}
+        attrib_a, attrib_b = a.attrib, b.attrib
+        if attrib_a != attrib_b:
+            edit['attrs'] = {
+                k: [attrib_a.get(k), attrib_b.get(k)]
+                for k in set(attrib_a) | set(attrib_b)
+                if attrib_a.get(k) != attrib_b.get(k)
+            }
+        text_a, text_b = _diff_own_text(a), _diff_own_text(b)
+        if text_a != text_b:
+            edit['text'] = [text_a[:DIFF_TEXT_LIMIT], text_b[:DIFF_TEXT_LIMIT]]
+        if edit:
+            emit({'op': '~', 'xpath': after_path(b), **edit})
+
+        # Unchanged siblings (equal subtree fingerprints) anchor the alignment, so
+        # removing one of several look-alike siblings is not read as a shift of edits
+        children_a = _diff_children(a)
+        children_b = _diff_children(b)
+        anchors = SequenceMatcher(
+            None,
+            [fp_before[c] for c in children_a],
+            [fp_after[c] for c in children_b],
+            autojunk=False
+        )
+        pending = []
+        for tag, i1, i2, j1, j2 in anchors.get_opcodes():
+            if tag != 'equal':
+                pair_siblings(children_a[i1:i2], children_b[j1:j2], pending)
+        stack.extend(reversed(pending))
+
+    return records
+
+
+def _prune_snapshot_cache():
+    """Delete snapshot cache files older than SNAPSHOT_CACHE_MAX_AGE; they can never be reused."""
+    cutoff = time.time() - SNAPSHOT_CACHE_MAX_AGE
+    with os.scandir(SNAPSHOT_CACHE_DIR) as it:
+        for entry in it:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+
+async def _kill_process_group(proc: asyncio.subprocess.Process):
+    """
+    SIGKILL a subprocess started with start_new_session=True, including any children
+    it spawned (its process group id is its pid), then reap it.
+    """
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    await proc.wait()
+
+
+def _strip_code_fences(code: str) -> str:
+    """
+    Remove a surrounding markdown code fence (```js ... ```) from generated code.
+
+    The opening fence line is dropped, as is the last line if it is a closing fence;
+    the body is sliced out once instead of splitting the file into lines.
+    """
+    if not code.startswith('```'):
+        return code
+    start = code.find('\n') + 1
+    if not start:
+        return ''
+    end = code.rfind('\n') + 1  # start of the last line
+    if code.startswith('```', end):
+        return code[start:end].strip()
+    return code[start:].strip()
+
+
+# AST nodes that start a new function body (class/object methods are FunctionExpressions)
+JS_FUNCTION_NODE_TYPES = frozenset({
+    'FunctionDeclaration', 'FunctionExpression', 'ArrowFunctionExpression'
+})
+
+
+def precheck_validation_js(js_code: str) -> Optional[str]:
+    """
+    Reject validation JavaScript that can never pass, without a browser round trip.
+
+    Validation code is evaluated as a top-level script, so a ``return`` outside
+    any function (even inside an if/loop block) always fails with "Illegal return
+    statement". Other parse errors are not
+    treated as fatal because esprima only understands ES2017 and the browser
+    may accept newer syntax (e.g. optional chaining).
+
+    Args:
+        js_code: Validation JavaScript to check
+
+    Returns:
+        Error message if the code must be rejected, None otherwise
+    """
+    if not ESPRIMA_AVAILABLE:
+        return None
+
+    try:
+        program = esprima.parseScript(js_code, {'tolerant': True, 'loc': True})
+    except esprima.Error:
+        # Usually newer syntax esprima doesn't know; the browser decides
+        return None
+
+    # Any return outside a function body is illegal, however deeply it is nested
+    # in blocks, ifs or loops; returns inside functions/arrows/methods are fine
+    stack = list(program.body)
+    while stack:
+        node = stack.pop()
+        if node.type == 'ReturnStatement':
+            return (f"Illegal return statement outside a function on line {node.loc.start.line} "
+                    f"- wrap the check in an IIFE or end with a bare expression")
+        if node.type in JS_FUNCTION_NODE_TYPES:
+            continue
+        for value in vars(node).values():
+            if isinstance(value, list):
+                stack.extend(v for v in value if isinstance(v, esprima.nodes.Node))
+            elif isinstance(value, esprima.nodes.Node):
+                stack.append(value)
+    return None
+
+
+async def _ensure_dir(path: str):
+    """
+    os.makedirs(path, exist_ok=True) on a worker thread, once per directory per process.
+
+    An empty path (a file in the current directory) needs no directory.
+    """
+    if path and path not in _created_dirs:
+        await asyncio.to_thread(os.makedirs, path, exist_ok=True)
+        _created_dirs.add(path)
+
+
+def _write_text(path: str, content: str):
+    """Write a UTF-8 text file (run via asyncio.to_thread)."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+
+def _write_html_snapshot(path: str, html: str, clean: bool = True):
+    """
+    Write captured HTML, filtered through filter_html_tags unless clean is False
+    (run via asyncio.to_thread).
+    """
+    _write_text(path, filter_html_tags(html) if clean else html)
+
+
+def _append_text(path: str, content: str):
+    """Append to a UTF-8 text file (run via asyncio.to_thread)."""
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(content)
+
+
+def _write_json(path: str, data: Any, indent: Optional[int] = 2):
+    """
+    Write a JSON file (run via asyncio.to_thread).
+
+    Pass indent=None for large machine-read data such as DOM snapshots: compact
+    json.dumps runs on the C encoder, while json.dump and any indent fall back to
+    the pure-Python one (~10x slower on multi-MB snapshots).
+    """
+    with open(path, 'w') as f:
+        f.write(json.dumps(data, indent=indent))
+
+
 class SnapshotBasedEvalBuilder:
     """Build eval files using before/after snapshots."""
 
-    def __init__(self, file_path: Optional[str] = None, workdir: Optional[str] = None, disable_filtering: bool = False):
+    def __init__(self, file_path: Optional[str] = None, workdir: Optional[str] = None,
+                 disable_filtering: bool = False, reuse_snapshot: bool = False,
+                 html_artifacts: bool = True):
+        if not workdir:
+            # Every artifact path below is joined onto workdir
+            raise ValueError("workdir is required")
         self.file_path = file_path
         self.workdir = workdir  # Working directory for snapshots and validation scripts
         self.disable_filtering = disable_filtering  # If False, filter <style> and <script> tags
+        self.reuse_snapshot = reuse_snapshot  # If True, reuse a recent cached BEFORE HTML capture
+        # If False, skip HTML capture, before/after.html and diff.json
+        self.html_artifacts = html_artifacts
         self.eval_data: Dict[str, Any] = {}
         self.client_id: Optional[str] = None
         self.tab_id: Optional[str] = None
         self.tab_id_before: Optional[str] = None  # Second tab with BEFORE state
         self.api_base = "http://localhost:8080"
 
+        # Artifact paths inside workdir, joined once up front
+        self.verify_js_path = os.path.join(workdir, 'verify.js')
+        self.request_file = os.path.join(workdir, 'CLAUDE_REQUEST.md')
+        self.extend_request_file = os.path.join(workdir, 'CLAUDE_EXTEND_REQUEST.md')
+        self.before_snapshot_file = os.path.join(workdir, 'before.json')
+        self.after_snapshot_file = os.path.join(workdir, 'after.json')
+        self.changes_file = os.path.join(workdir, 'changes.json')
+        self.before_html_file = os.path.join(workdir, 'before.html')
+        self.after_html_file = os.path.join(workdir, 'after.html')
+        self.diff_file = os.path.join(workdir, 'diff.json')
+        self.errors_log = os.path.join(workdir, 'errors.log')
+        self.last_validation_error: Optional[str] = None  # Set by _test_validation on failure
+        # (snapshot, tree) for extend mode
+        self._baseline_tree: Optional[Tuple[Dict[str, Any], Any]] = None
+
+        # Persistent HTTP session - keeps connections to the API server alive across calls
+        self.http = requests.Session()
+        self.http.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=API_POOL_MAXSIZE))
+        self.http.headers["Connection"] = "keep-alive"
+
         # DOM snapshots (CDP format) - primary
         self.dom_snapshot_before: Optional[Dict[str, Any]] = None
         self.dom_snapshot_after: Optional[Dict[str, Any]] = None
@@ -192,11 +925,107 @@ class SnapshotBasedEvalBuilder:
         self.html_snapshot_before: Optional[str] = None
         self.html_snapshot_after: Optional[str] = None
 
+    def close(self):
+        """Release the HTTP session."""
+        self.http.close()
+
+    async def _api(self, method: str, path: str, **kwargs) -> requests.Response:
+        """Send an API request on a worker thread so the event loop is not blocked."""
+        return await asyncio.to_thread(
+            self.http.request, method, f"{self.api_base}{path}", **kwargs
+        )
+
+    async def _api_json(self, method: str, path: str, **kwargs) -> Any:
+        """
+        Send an API request and decode its JSON body, both on a worker thread.
+
+        Meant for large payloads (page HTML, DOM snapshots): decoding stays off the
+        event loop and the raw response body is released as soon as it is parsed.
+
+        Raises:
+            requests.exceptions.RequestException: On HTTP errors or an invalid JSON body
+        """
+        def request():
+            with self.http.request(method, f"{self.api_base}{path}", **kwargs) as resp:
+                resp.raise_for_status()
+                return resp.json()
+
+        return await asyncio.to_thread(request)
+
+    def _claude_command(self, prompt: str, session_id: Optional[str] = None) -> List[str]:
+        """
+        Build the Claude Code CLI command for a prompt.
+
+        Runs in print mode with JSON output so the session id can be read back.
+        Passing session_id resumes that exact conversation (--resume), never
+        whichever session happens to be most recent in the working directory.
+        """
+        command = ['claude', '--dangerously-skip-permissions', '-p', '--output-format', 'json']
+        if session_id:
+            command += ['--resume', session_id]
+        command.append(prompt)
+        return command
+
+    async def _run_claude(
+        self, prompt: str, session_id: Optional[str] = None, timeout: float = CLAUDE_TIMEOUT
+    ) -> Tuple[subprocess.CompletedProcess, Optional[str]]:
+        """
+        Run Claude Code on a prompt without blocking the event loop.
+
+        Args:
+            prompt: Prompt passed to the claude CLI
+            session_id: Session to resume (from an earlier call in the same step), or None
+            timeout: Seconds to wait before killing the process
+
+        Returns:
+            (CompletedProcess with Claude's reply as stdout and decoded stderr,
+             session id to pass to follow-up calls, or None if it could not be read)
+
+        Raises:
+            subprocess.TimeoutExpired: If the run exceeds the timeout (the process is killed)
+            FileNotFoundError: If the claude CLI is not installed
+        """
+        command = self._claude_command(prompt, session_id)
+        # Own process group, so a timeout or Ctrl+C also kills the tools Claude Code spawned
+        proc = await asyncio.create_subprocess_exec(
+            *command,
+            cwd=os.getcwd(),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+        except asyncio.TimeoutError:
+            await _kill_process_group(proc)
+            raise subprocess.TimeoutExpired(command, timeout)
+        except asyncio.CancelledError:
+            await _kill_process_group(proc)
+            raise
+
+        output = stdout.decode(errors='replace')
+        new_session_id = None
+        try:
+            reply = json.loads(output)
+        except json.JSONDecodeError:
+            reply = None
+        if isinstance(reply, dict):
+            output = str(reply.get('result', ''))
+            new_session_id = reply.get('session_id')
+
+        result = subprocess.CompletedProcess(
+            command, proc.returncode, output, stderr.decode(errors='replace')
+        )
+        return result, new_session_id
+
+    async def _ainput(self, prompt: str = "") -> str:
+        """Read a line with input() on a worker thread so the event loop keeps running."""
+        return await asyncio.to_thread(input, prompt)
+
     async def run(self):
         """Main workflow."""
         # Check for existing verify.js - offer extend mode
-        verify_js_path = os.path.join(self.workdir, 'verify.js')
-        if os.path.exists(verify_js_path):
+        if os.path.exists(self.verify_js_path):
             print("📋 Existing verify.js detected!")
             print()
             print("Choose mode:")
@@ -204,7 +1033,7 @@ class SnapshotBasedEvalBuilder:
             print("  [R]ebuild - Start from scratch")
             print("  [Q]uit")
             print()
-            choice = input("Choice: ").strip().lower()
+            choice = (await self._ainput("Choice: ")).strip().lower()
             if choice == 'e':
                 await self.run_extend()
                 return
@@ -241,11 +1070,14 @@ class SnapshotBasedEvalBuilder:
         # Step 6: Capture AFTER snapshot
         await self.step_6_capture_after()
 
-        # Step 6.5: Open second tab with BEFORE state
+        # Step 6.5: Open second tab with BEFORE state. The tab opens in the foreground,
+        # so it must not start until the AFTER capture is done (focus/blur state)
         await self.step_6_5_open_before_tab()
 
         # Step 7: Compare and generate validation
-        await self.step_7_generate_validation()
+        if not await self.step_7_generate_validation():
+            print("\n⚠️  No change detected - please retry. Eval file not saved.")
+            return
 
         # Step 8: Save file
         await self.step_8_save_file()
@@ -253,7 +1085,7 @@ class SnapshotBasedEvalBuilder:
         print("\n✅ Complete!")
         print(f"📄 Saved to: {self.file_path}")
 
-    def _capture_dom_snapshot(self, label: str) -> Optional[Dict[str, Any]]:
+    async def _capture_dom_snapshot(self, label: str) -> Optional[Dict[str, Any]]:
         """
         Capture DOM snapshot using CDP.
 
@@ -265,8 +1097,8 @@ class SnapshotBasedEvalBuilder:
         """
         try:
             print(f"📸 Capturing DOM snapshot ({label})...")
-            resp = requests.post(
-                f"{self.api_base}/page/dom-snapshot",
+            result = await self._api_json(
+                'POST', '/page/dom-snapshot',
                 json={
                     "clientId": self.client_id,
                     "tabId": self.tab_id,
@@ -275,8 +1107,6 @@ class SnapshotBasedEvalBuilder:
                 },
                 timeout=10
             )
-            resp.raise_for_status()
-            result = resp.json()
 
             snapshot = result.get('snapshot')
             if not snapshot:
@@ -300,8 +1130,7 @@ class SnapshotBasedEvalBuilder:
 
         if os.path.exists(self.file_path):
             print(f"📖 Loading: {self.file_path}")
-            with open(self.file_path, 'r') as f:
-                self.eval_data = yaml.safe_load(f)
+            self.eval_data = load_yaml_cached(self.file_path)
             print("✅ Loaded")
         else:
             print(f"📝 Creating new: {self.file_path}")
@@ -329,7 +1158,7 @@ class SnapshotBasedEvalBuilder:
             else:
                 current = self.eval_data.get(key, '')
 
-            value = self._prompt_field(prompt, current)
+            value = await self._prompt_field(prompt, current)
 
             if key == 'url':
                 if 'target' not in self.eval_data:
@@ -351,24 +1180,13 @@ class SnapshotBasedEvalBuilder:
         url = self.eval_data['target']['url']
 
         try:
-            # Get client
             print("🔍 Getting browser client...")
-            resp = requests.get(f"{self.api_base}/clients", timeout=5)
-            resp.raise_for_status()
-            clients = resp.json()
-
-            if not clients:
-                print("❌ No browser clients. Is BrowserOperator running?")
-                print("   Start it: cd deployments/local && make compose-up")
-                sys.exit(1)
-
-            self.client_id = clients[0]['id']
-            print(f"✅ Client: {self.client_id}")
+            await self._resolve_client()
 
             # Open tab
             print(f"🌐 Opening: {url}")
-            resp = requests.post(
-                f"{self.api_base}/tabs/open",
+            resp = await self._api(
+                'POST', '/tabs/open',
                 json={
                     "clientId": self.client_id,
                     "url": url,
@@ -393,22 +1211,31 @@ class SnapshotBasedEvalBuilder:
             print("   Make sure BrowserOperator is running at http://localhost:8080")
             sys.exit(1)
 
+    async def _resolve_client(self):
+        """
+        Set self.client_id from GET /clients (shared by step 3 and extend mode).
+
+        Raises:
+            requests.exceptions.RequestException: If the API server is unreachable
+        """
+        resp = await self._api('GET', '/clients', timeout=5)
+        resp.raise_for_status()
+        clients = resp.json()
+
+        if not clients:
+            print("❌ No browser clients. Is BrowserOperator running?")
+            print("   Start it: cd deployments/local && make compose-up")
+            sys.exit(1)
+
+        self.client_id = clients[0]['id']
+        print(f"✅ Client: {self.client_id}")
+
     async def _get_browser_client(self):
         """Get browser client without opening a tab. Used in extend mode."""
         print("\n🔍 Getting browser client...\n")
 
         try:
-            resp = requests.get(f"{self.api_base}/clients", timeout=5)
-            resp.raise_for_status()
-            clients = resp.json()
-
-            if not clients:
-                print("❌ No browser clients. Is BrowserOperator running?")
-                print("   Start it: cd deployments/local && make compose-up")
-                sys.exit(1)
-
-            self.client_id = clients[0]['id']
-            print(f"✅ Client: {self.client_id}")
+            await self._resolve_client()
             print("   💡 Tabs will be opened on-demand for each example")
 
         except requests.exceptions.RequestException as e:
@@ -420,18 +1247,48 @@ class SnapshotBasedEvalBuilder:
         """Step 4: Capture BEFORE snapshot."""
         print("\n📸 Step 4: Capture BEFORE Snapshot\n")
 
-        # Capture DOM snapshot (primary)
-        self.dom_snapshot_before = self._capture_dom_snapshot("BEFORE")
+        url = self.eval_data['target']['url']
+        cached_html = None
+        if self.reuse_snapshot and self.html_artifacts:
+            cached_html = await asyncio.to_thread(self._load_cached_before_html, url)
+
+        if cached_html is not None:
+            # Capture DOM snapshot (primary), HTML backup comes from cache
+            self.dom_snapshot_before = await self._capture_dom_snapshot("BEFORE")
+            self.html_snapshot_before = cached_html
+            print(f"♻️  Reusing cached HTML reference ({len(cached_html)} bytes)")
+        else:
+            # Capture DOM snapshot (primary) and HTML backup in one round trip
+            self.dom_snapshot_before, self.html_snapshot_before = await asyncio.gather(
+                self._capture_dom_snapshot("BEFORE"),
+                self._capture_html("BEFORE")
+            )
+            if self.reuse_snapshot and self.html_snapshot_before is not None:
+                await asyncio.to_thread(
+                    self._store_cached_before_html, url, self.html_snapshot_before
+                )
 
         if not self.dom_snapshot_before:
             print("❌ Failed to capture DOM snapshot")
             sys.exit(1)
 
-        # Optional: Capture HTML as backup for manual inspection
+    async def _capture_html(self, label: str) -> Optional[str]:
+        """
+        Capture page HTML for manual inspection (non-critical).
+
+        Args:
+            label: Label for logging (e.g., "BEFORE", "AFTER")
+
+        Returns:
+            HTML content, or None on error or when HTML artifacts are disabled
+        """
+        if not self.html_artifacts:
+            return None
+
         try:
-            print("📸 Capturing HTML for reference...")
-            resp = requests.post(
-                f"{self.api_base}/page/content",
+            print(f"📸 Capturing HTML for reference ({label})...")
+            result = await self._api_json(
+                'POST', '/page/content',
                 json={
                     "clientId": self.client_id,
                     "tabId": self.tab_id,
@@ -440,12 +1297,71 @@ class SnapshotBasedEvalBuilder:
                 },
                 timeout=10
             )
-            resp.raise_for_status()
-            result = resp.json()
-            self.html_snapshot_before = result['content']
-            print(f"✅ Captured HTML reference ({len(self.html_snapshot_before)} bytes)")
+            html = result['content']
+            print(f"✅ Captured {label} HTML reference ({len(html)} bytes)")
+            return html
         except Exception as e:
             print(f"⚠️  HTML capture failed (non-critical): {e}")
+            return None
+
+    def _snapshot_cache_paths(self, url: str) -> Tuple[Path, Path]:
+        """Return (html, metadata) cache paths for a (url, client_id) pair."""
+        key = hashlib.blake2b(
+            f"{self.client_id}\n{url}".encode('utf-8'), digest_size=16
+        ).hexdigest()
+        return SNAPSHOT_CACHE_DIR / f"{key}.html", SNAPSHOT_CACHE_DIR / f"{key}.json"
+
+    def _load_cached_before_html(self, url: str) -> Optional[str]:
+        """
+        Load a cached BEFORE HTML capture if it is younger than SNAPSHOT_CACHE_MAX_AGE
+        (run via asyncio.to_thread).
+        """
+        html_path, meta_path = self._snapshot_cache_paths(url)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            if time.time() - meta['captured_at'] > SNAPSHOT_CACHE_MAX_AGE:
+                return None
+            if meta.get('compression') == 'zstd':
+                if not ZSTD_AVAILABLE:
+                    return None
+                with open(html_path.with_suffix('.html.zst'), 'rb') as f:
+                    data = f.read()
+                try:
+                    return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+                except zstandard.ZstdError:
+                    return None
+            with open(html_path, 'r', encoding='utf-8') as f:
+                return f.read()
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _store_cached_before_html(self, url: str, html: str):
+        """
+        Persist a BEFORE HTML capture for later --reuse-snapshot runs (run via asyncio.to_thread).
+
+        The HTML is zstd-compressed when the zstandard package is installed; page
+        captures are highly repetitive and typically shrink by an order of magnitude.
+        Entries too old to be reused are pruned first.
+        """
+        html_path, meta_path = self._snapshot_cache_paths(url)
+        compression = 'zstd' if ZSTD_AVAILABLE else None
+        try:
+            SNAPSHOT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            _prune_snapshot_cache()
+            if compression:
+                compressor = zstandard.ZstdCompressor(level=SNAPSHOT_CACHE_ZSTD_LEVEL)
+                data = compressor.compress(html.encode('utf-8'))
+                with open(html_path.with_suffix('.html.zst'), 'wb') as f:
+                    f.write(data)
+            else:
+                with open(html_path, 'w', encoding='utf-8') as f:
+                    f.write(html)
+            with open(meta_path, 'w') as f:
+                json.dump({'url': url, 'client_id': self.client_id, 'captured_at': time.time(),
+                           'compression': compression}, f)
+        except OSError as e:
+            print(f"⚠️  Could not cache HTML reference: {e}")
 
     async def step_5_wait_for_action(self):
         """Step 5: Wait for user to perform action."""
@@ -457,40 +1373,23 @@ class SnapshotBasedEvalBuilder:
         print("   The browser should be visible at http://localhost:8000")
         print()
 
-        input("Press Enter when you've completed the action...")
+        await self._ainput("Press Enter when you've completed the action...")
         print("✅ Action completed")
 
     async def step_6_capture_after(self):
         """Step 6: Capture AFTER snapshot."""
         print("\n📸 Step 6: Capture AFTER Snapshot\n")
 
-        # Capture DOM snapshot (primary)
-        self.dom_snapshot_after = self._capture_dom_snapshot("AFTER")
+        # Capture DOM snapshot (primary) and HTML backup in one round trip
+        self.dom_snapshot_after, self.html_snapshot_after = await asyncio.gather(
+            self._capture_dom_snapshot("AFTER"),
+            self._capture_html("AFTER")
+        )
 
         if not self.dom_snapshot_after:
             print("❌ Failed to capture DOM snapshot")
             sys.exit(1)
 
-        # Optional: Capture HTML as backup
-        try:
-            print("📸 Capturing HTML for reference...")
-            resp = requests.post(
-                f"{self.api_base}/page/content",
-                json={
-                    "clientId": self.client_id,
-                    "tabId": self.tab_id,
-                    "format": "html",
-                    "includeIframes": False
-                },
-                timeout=10
-            )
-            resp.raise_for_status()
-            result = resp.json()
-            self.html_snapshot_after = result['content']
-            print(f"✅ Captured HTML reference ({len(self.html_snapshot_after)} bytes)")
-        except Exception as e:
-            print(f"⚠️  HTML capture failed (non-critical): {e}")
-
     async def step_6_5_open_before_tab(self):
         """Step 6.5: Open second tab with BEFORE state for validation testing."""
         print("\n🔄 Step 6.5: Open BEFORE State Tab for Validation\n")
@@ -501,8 +1400,8 @@ class SnapshotBasedEvalBuilder:
             print("   This tab will have the BEFORE state (no action performed)")
             print("   It will be used to verify validation returns FALSE\n")
 
-            resp = requests.post(
-                f"{self.api_base}/tabs/open",
+            resp = await self._api(
+                'POST', '/tabs/open',
                 json={
                     "clientId": self.client_id,
                     "url": url,
@@ -559,20 +1458,10 @@ class SnapshotBasedEvalBuilder:
         summary_lines.append("")
 
         # Show top 15 most important changes
-        priority_types = [
-            ChangeType.FORM_VALUE_CHANGED,
-            ChangeType.CHECKBOX_STATE_CHANGED,
-            ChangeType.OPTION_SELECTED_CHANGED,
-            ChangeType.NODE_ADDED,
-            ChangeType.NODE_REMOVED,
-            ChangeType.TEXT_CHANGED,
-            ChangeType.ATTR_MODIFIED,
-        ]
-
         shown = 0
         max_show = 15
 
-        for change_type in priority_types:
+        for change_type in CHANGE_PRIORITY_TYPES:
             if change_type in grouped_changes and shown < max_show:
                 summary_lines.append(f"### {change_type.value}")
                 summary_lines.append("")
@@ -596,18 +1485,91 @@ class SnapshotBasedEvalBuilder:
 
         return "\n".join(summary_lines)
 
-    async def step_7_generate_validation(self):
-        """Step 7: Compare snapshots and generate validation using Claude Code."""
+    async def _write_html_artifacts(self) -> int:
+        """
+        Write before/after.html and the element-level diff.json, all off the event loop.
+
+        Returns:
+            Number of node changes in the HTML diff
+        """
+        # Filter and write both sides concurrently
+        clean = not self.disable_filtering
+        await asyncio.gather(
+            asyncio.to_thread(
+                _write_html_snapshot, self.before_html_file, self.html_snapshot_before, clean
+            ),
+            asyncio.to_thread(
+                _write_html_snapshot, self.after_html_file, self.html_snapshot_after, clean
+            )
+        )
+
+        # Generate element-level diff for reference from the files written above
+        html_diff = await asyncio.to_thread(
+            _dom_diff_files, self.before_html_file, self.after_html_file
+        )
+        await asyncio.to_thread(_write_json, self.diff_file, html_diff)
+        return len(html_diff)
+
+    async def step_7_generate_validation(self) -> bool:
+        """
+        Step 7: Compare snapshots and generate validation using Claude Code.
+
+        Returns:
+            False if BEFORE and AFTER are identical (nothing to validate), True otherwise
+        """
         print("\n🔍 Step 7: Generate Validation from Differences\n")
 
+        # Fast path: identical snapshots mean the action was not performed (or was
+        # performed on another tab). HTML equality alone is not enough - typed form
+        # values only show up in the DOM snapshot.
+        if self.dom_snapshot_before == self.dom_snapshot_after:
+            print("❌ No changes detected between BEFORE and AFTER")
+            print("   Make sure the action was performed in the captured tab, "
+                  "then re-run to generate validation")
+            return False
+
         print("🔍 Analyzing DOM changes...")
 
+        # Save artifacts to workdir
+        snapshot_dir = self.workdir
+        await _ensure_dir(snapshot_dir)
+        before_snapshot_file = self.before_snapshot_file
+        after_snapshot_file = self.after_snapshot_file
+        changes_file = self.changes_file
+
+        # Raw snapshots (for debugging) don't depend on the comparison, so they are
+        # written while the trees are built
+        snapshot_writes = asyncio.gather(
+            asyncio.to_thread(_write_json, before_snapshot_file, self.dom_snapshot_before, None),
+            asyncio.to_thread(_write_json, after_snapshot_file, self.dom_snapshot_after, None)
+        )
+
+        # Optional HTML reference artifacts are independent of the comparison as well
+        have_html = bool(self.html_snapshot_before and self.html_snapshot_after)
+        html_size = 0
+        if have_html:
+            html_size = max(len(self.html_snapshot_before), len(self.html_snapshot_after))
+        html_task = None
+        if have_html and html_size <= HTML_ARTIFACT_MAX_CHARS:
+            html_task = asyncio.create_task(self._write_html_artifacts())
+
         # Build enhanced trees from snapshots
         print("🌲 Building DOM trees with DEFAULT_FILTERS...")
-        tree_before = build_enhanced_tree(self.dom_snapshot_before, filters=DEFAULT_FILTERS)
-        tree_after = build_enhanced_tree(self.dom_snapshot_after, filters=DEFAULT_FILTERS)
+        try:
+            tree_before, tree_after = await asyncio.to_thread(lambda: (
+                build_enhanced_tree(self.dom_snapshot_before, filters=DEFAULT_FILTERS),
+                build_enhanced_tree(self.dom_snapshot_after, filters=DEFAULT_FILTERS)
+            ))
+        except BaseException:
+            # Let the snapshot and HTML writes finish (and retrieve their errors) instead
+            # of orphaning half-written files; the build error is the one to report
+            await asyncio.gather(
+                snapshot_writes, *([html_task] if html_task else []), return_exceptions=True
+            )
+            raise
 
         if not tree_before or not tree_after:
+            await asyncio.gather(snapshot_writes, *([html_task] if html_task else []))
             print("❌ Failed to build DOM trees")
             sys.exit(1)
 
@@ -622,22 +1584,7 @@ class SnapshotBasedEvalBuilder:
         for change_type, changes_list in grouped_changes.items():
             print(f"   {change_type.value}: {len(changes_list)}")
 
-        # Save artifacts to workdir
-        snapshot_dir = self.workdir
-        os.makedirs(snapshot_dir, exist_ok=True)
-
-        # Save raw snapshots (for debugging)
-        before_snapshot_file = f"{snapshot_dir}/before.json"
-        after_snapshot_file = f"{snapshot_dir}/after.json"
-
-        with open(before_snapshot_file, 'w') as f:
-            json.dump(self.dom_snapshot_before, f, indent=2)
-
-        with open(after_snapshot_file, 'w') as f:
-            json.dump(self.dom_snapshot_after, f, indent=2)
-
         # Save structured changes
-        changes_file = f"{snapshot_dir}/changes.json"
         changes_data = {
             'total_changes': len(changes),
             'changes_by_type': {
@@ -647,57 +1594,42 @@ class SnapshotBasedEvalBuilder:
             'changes': [change.to_dict() for change in changes]
         }
 
-        with open(changes_file, 'w') as f:
-            json.dump(changes_data, f, indent=2)
+        await asyncio.gather(
+            snapshot_writes,
+            asyncio.to_thread(_write_json, changes_file, changes_data)
+        )
 
         print(f"\n📁 Artifacts saved:")
         print(f"   BEFORE: {before_snapshot_file}")
         print(f"   AFTER:  {after_snapshot_file}")
         print(f"   CHANGES: {changes_file}")
 
-        # Optional: Save HTML diffs for supplementary inspection
-        if self.html_snapshot_before and self.html_snapshot_after:
-            # Apply filtering to HTML
-            before_html = filter_html_tags(self.html_snapshot_before) if not self.disable_filtering else self.html_snapshot_before
-            after_html = filter_html_tags(self.html_snapshot_after) if not self.disable_filtering else self.html_snapshot_after
-
-            with open(f"{snapshot_dir}/before.html", 'w') as f:
-                f.write(before_html)
-
-            with open(f"{snapshot_dir}/after.html", 'w') as f:
-                f.write(after_html)
-
-            # Generate diff for reference
-            before_lines = before_html.split('\n')
-            after_lines = after_html.split('\n')
-            diff = list(unified_diff(before_lines, after_lines, lineterm='', n=3))
-
-            with open(f"{snapshot_dir}/diff.txt", 'w') as f:
-                f.write('\n'.join(diff))
-
-            print(f"   BEFORE HTML: {snapshot_dir}/before.html")
-            print(f"   AFTER HTML: {snapshot_dir}/after.html")
-            print(f"   HTML DIFF: {snapshot_dir}/diff.txt")
+        # Optional: HTML diffs for supplementary inspection (started before the tree build)
+        if html_task is not None:
+            html_diff_count = await html_task
+            print(f"   BEFORE HTML: {self.before_html_file}")
+            print(f"   AFTER HTML: {self.after_html_file}")
+            print(f"   HTML DIFF: {self.diff_file} ({html_diff_count} node changes)")
             print(f"   (HTML files are for reference only)")
+        else:
+            if have_html:
+                print(f"   ⏭️  HTML artifacts skipped: page HTML is {html_size} chars "
+                      f"(limit {HTML_ARTIFACT_MAX_CHARS})")
+            elif not self.html_artifacts:
+                print("   ⏭️  HTML artifacts skipped (--no-html-artifacts)")
+
+            # Don't leave a previous run's HTML artifacts behind for Claude Code to read
+            for path in (self.before_html_file, self.after_html_file, self.diff_file):
+                if os.path.exists(path):
+                    os.remove(path)
 
         # Show sample of important changes
         print("\n📝 Key changes detected:")
 
-        # Prioritize change types for display
-        priority_types = [
-            ChangeType.FORM_VALUE_CHANGED,
-            ChangeType.CHECKBOX_STATE_CHANGED,
-            ChangeType.OPTION_SELECTED_CHANGED,
-            ChangeType.NODE_ADDED,
-            ChangeType.NODE_REMOVED,
-            ChangeType.TEXT_CHANGED,
-            ChangeType.ATTR_MODIFIED,
-        ]
-
         shown = 0
         max_show = 10
 
-        for change_type in priority_types:
+        for change_type in CHANGE_PRIORITY_TYPES:
             if change_type in grouped_changes and shown < max_show:
                 for change in grouped_changes[change_type][:3]:  # Max 3 per type
                     if shown >= max_show:
@@ -711,170 +1643,48 @@ class SnapshotBasedEvalBuilder:
         if len(changes) > shown:
             print(f"   ... and {len(changes) - shown} more changes")
 
-        print("\n" + "=" * 80)
+        print("\n" + BANNER_RULE)
         print("🤖 CALLING CLAUDE CODE TO ANALYZE CHANGES")
-        print("=" * 80)
+        print(BANNER_RULE)
         print()
 
         # Create marker file for Claude Code
-        marker_file = f"{snapshot_dir}/CLAUDE_REQUEST.md"
+        marker_file = self.request_file
 
         # Generate human-readable change summary
         change_summary = self._generate_change_summary(grouped_changes, changes)
 
-        with open(marker_file, 'w') as f:
-            f.write(f"""# Claude Code: Generate Validation JavaScript
-
-## Objective
-{self.eval_data['input']['objective']}
-
-## Task
-Analyze the DOM changes and generate JavaScript validation code.
-
-## Files to Analyze
-
-### Primary Analysis (Semantic Changes)
-- **CHANGES**: {changes_file} - Structured semantic changes
-- **BEFORE**: {before_snapshot_file} - DOM snapshot before action (for reference)
-- **AFTER**: {after_snapshot_file} - DOM snapshot after action (for reference)
-
-### Supplementary (Optional)
-- **BEFORE HTML**: {snapshot_dir}/before.html - HTML for manual inspection
-- **AFTER HTML**: {snapshot_dir}/after.html - HTML for manual inspection
-- **HTML DIFF**: {snapshot_dir}/diff.txt - Line-by-line HTML diff
-
-## Detected Changes Summary
-
-{change_summary}
-
-## Change Types Explained
-
-- `form_value_changed`: Input/textarea value changed
-- `checkbox_state_changed`: Checkbox/radio checked state changed
-- `option_selected_changed`: Select option selected state changed
-- `node_added`: New element appeared in DOM
-- `node_removed`: Element removed from DOM
-- `text_changed`: Text content changed
-- `attr_modified`: Attribute value changed
-- `attr_added`: New attribute added
-- `attr_removed`: Attribute removed
-- `position_changed`: Element position/size changed
-- `style_changed`: Computed styles changed
-
-## Instructions
-
-1. **Read the changes.json file** - This contains structured semantic changes
-2. **Identify the specific changes** that indicate the objective was completed
-3. **Generate JavaScript validation code** that:
-   - Checks if the objective was completed successfully
-   - **CRITICAL: DO NOT use `return` statements - end with a boolean expression**
-   - Is based on ACTUAL observed changes (from changes.json)
-   - Works in the browser context
-   - Focuses on the most significant/reliable changes
-
-## CRITICAL: Output Format
-
-**DO NOT USE RETURN STATEMENTS!** The code is evaluated as an expression, not a function.
-
-❌ WRONG:
-```javascript
-return document.querySelector('#success') !== null;
-```
-
-✅ CORRECT:
-```javascript
-// Check for the specific change
-const element = document.querySelector('...');
-element && element.value === 'expected'
-```
-
-The last line should be a boolean expression (no return keyword).
-
-## Testing Your Code
-
-**YOU MUST TEST YOUR CODE ON BOTH TABS** before declaring it complete.
-
-**Endpoint:** POST http://localhost:8080/page/execute
-
-**Browser State Information:**
-- **Client ID:** {self.client_id}
-- **Tab ID (AFTER - task completed):** {self.tab_id}
-- **Tab ID (BEFORE - initial state):** {self.tab_id_before}
-
-**Test 1: AFTER Tab (Should Return TRUE):**
-```bash
-curl -X POST http://localhost:8080/page/execute \\
-  -H "Content-Type: application/json" \\
-  -d '{{
-    "clientId": "{self.client_id}",
-    "tabId": "{self.tab_id}",
-    "expression": "YOUR_JAVASCRIPT_CODE_HERE",
-    "returnByValue": true,
-    "awaitPromise": false
-  }}'
-```
-
-**Expected Response:** `{{"result": {{"value": true}}}}`
-
-**Test 2: BEFORE Tab (Should Return FALSE):**
-```bash
-curl -X POST http://localhost:8080/page/execute \\
-  -H "Content-Type: application/json" \\
-  -d '{{
-    "clientId": "{self.client_id}",
-    "tabId": "{self.tab_id_before}",
-    "expression": "YOUR_JAVASCRIPT_CODE_HERE",
-    "returnByValue": true,
-    "awaitPromise": false
-  }}'
-```
-
-**Expected Response:** `{{"result": {{"value": false}}}}`
-
-**CRITICAL:** Your validation MUST:
-- Return TRUE on the AFTER tab (task completed)
-- Return FALSE on the BEFORE tab (task not done)
-- This proves your validation correctly detects the change
-
-**Error Response:**
-```json
-{{
-  "exceptionDetails": {{ "text": "Error message here" }}
-}}
-```
-
-## Workflow
-
-1. Read changes.json to understand what changed
-2. Write validation code to: {snapshot_dir}/verify.js
-3. Test it on the AFTER tab (should return TRUE)
-4. Test it on the BEFORE tab (should return FALSE)
-5. If you get errors or wrong results:
-   - Read the existing {snapshot_dir}/verify.js
-   - Identify the issue from the API error response
-   - Edit and fix the file
-   - Save the improved version
-   - Test BOTH tabs again
-6. Iterate until:
-   - AFTER tab returns {{"result": {{"value": true}}}}
-   - BEFORE tab returns {{"result": {{"value": false}}}}
-7. Only then is your code complete
-
-## Save Your Response
-When you generate WORKING validation JavaScript (tested via API), save it to:
-{snapshot_dir}/verify.js
+        # The request is written once; retries only append to errors.log
+        if os.path.exists(self.errors_log):
+            os.remove(self.errors_log)
 
-The orchestrator will automatically pick it up and test it again for confirmation.
+        html_artifacts_section = ''
+        if html_task is not None:
+            html_artifacts_section = CLAUDE_REQUEST_HTML_SECTION.format(
+                before_html_file=self.before_html_file,
+                after_html_file=self.after_html_file,
+                diff_file=self.diff_file
+            )
 
-**IMPORTANT:** The file will NOT be deleted between iterations. You can read it,
-learn from previous attempts, and improve it iteratively.
-""")
+        with open(marker_file, 'w') as f:
+            f.write(CLAUDE_REQUEST_TEMPLATE.format_map({
+                'objective': self.eval_data['input']['objective'],
+                'changes_file': changes_file,
+                'before_snapshot_file': before_snapshot_file,
+                'after_snapshot_file': after_snapshot_file,
+                'snapshot_dir': snapshot_dir,
+                'html_artifacts_section': html_artifacts_section,
+                'change_summary': change_summary,
+                'client_id': self.client_id,
+                'tab_id': self.tab_id,
+                'tab_id_before': self.tab_id_before
+            }))
 
         print(f"📝 Created request file: {marker_file}")
         print()
-        print("=" * 80)
+        print(BANNER_RULE)
         print("🤖 CLAUDE CODE: Generate and Test Validation JavaScript")
-        print("=" * 80)
+        print(BANNER_RULE)
         print()
         print("📋 API Testing Information:")
         print(f"   Endpoint:     POST http://localhost:8080/page/execute")
@@ -895,17 +1705,17 @@ learn from previous attempts, and improve it iteratively.
             print(f"      - Test on AFTER tab ({self.tab_id}) should return TRUE")
         print(f"   4. Fix any errors (especially 'Illegal return statement')")
         print(f"   5. Iterate until both tests pass correctly")
-        print(f"   6. Save working code to: {snapshot_dir}/verify.js")
+        print(f"   6. Save working code to: {self.verify_js_path}")
         print()
         print("⚠️  CRITICAL: NO return statements! End with boolean expression.")
         if self.tab_id_before:
             print("⚠️  MUST TEST BOTH TABS: TRUE on AFTER, FALSE on BEFORE")
         print()
-        print("=" * 80)
+        print(BANNER_RULE)
         print()
 
         # Wait for Claude to create the validation file
-        validation_file = f"{snapshot_dir}/verify.js"
+        validation_file = self.verify_js_path
 
         # Automatically run Claude Code subprocess (no user prompt)
         print("🤖 Auto-running Claude Code subprocess to generate validation...")
@@ -913,6 +1723,8 @@ learn from previous attempts, and improve it iteratively.
 
         choice = '1'
         lines = []
+        # Fix retries resume the Claude session that generated verify.js
+        claude_session_id = None
 
         if choice == '1':
             # Automatically spawn Claude Code subprocess
@@ -923,22 +1735,15 @@ learn from previous attempts, and improve it iteratively.
             claude_prompt = f"Read @{marker_file} and complete the task described there. Generate the validation JavaScript and save it to {validation_file}. Test it on both tabs as instructed."
 
             try:
-                # Call Claude Code CLI with --dangerously-skip-permissions for auto-accept
-                result = subprocess.run(
-                    ['claude', '--dangerously-skip-permissions', claude_prompt],
-                    cwd=os.getcwd(),
-                    capture_output=True,
-                    text=True,
-                    timeout=300  # 5 minute timeout
-                )
+                result, claude_session_id = await self._run_claude(claude_prompt)
 
                 print("Claude Code output:")
-                print("─" * 60)
+                print(RULE)
                 print(result.stdout)
                 if result.stderr:
                     print("Errors:")
                     print(result.stderr)
-                print("─" * 60)
+                print(RULE)
                 print()
 
                 # Check if verify.js was created
@@ -948,19 +1753,13 @@ learn from previous attempts, and improve it iteratively.
                         js_code = f.read().strip()
 
                     # Clean up if it has markdown code blocks
-                    if js_code.startswith('```'):
-                        lines_raw = js_code.split('\n')
-                        if lines_raw[0].startswith('```'):
-                            lines_raw = lines_raw[1:]
-                        if lines_raw[-1].startswith('```'):
-                            lines_raw = lines_raw[:-1]
-                        js_code = '\n'.join(lines_raw).strip()
+                    js_code = _strip_code_fences(js_code)
 
                     print()
                     print("📝 Loaded validation code:")
-                    print("─" * 60)
+                    print(RULE)
                     print(js_code[:300] + "..." if len(js_code) > 300 else js_code)
-                    print("─" * 60)
+                    print(RULE)
 
                     lines = js_code.split('\n')
                 else:
@@ -985,53 +1784,10 @@ learn from previous attempts, and improve it iteratively.
                 choice = '3'
                 lines = []
 
-        elif choice == '2':
-            print(f"\n⏳ Waiting for {validation_file} to be created...")
-            print("   (Claude Code will create this file)")
-            print()
-
-            # Poll for file creation
-            max_wait = 300  # 5 minutes
-            waited = 0
-            while waited < max_wait:
-                if os.path.exists(validation_file):
-                    print("✅ Validation file detected!")
-                    with open(validation_file, 'r') as f:
-                        js_code = f.read().strip()
-
-                    # Clean up if it has markdown code blocks
-                    if js_code.startswith('```'):
-                        # Remove markdown code fences
-                        lines_raw = js_code.split('\n')
-                        if lines_raw[0].startswith('```'):
-                            lines_raw = lines_raw[1:]
-                        if lines_raw[-1].startswith('```'):
-                            lines_raw = lines_raw[:-1]
-                        js_code = '\n'.join(lines_raw).strip()
-
-                    print()
-                    print("📝 Loaded validation code:")
-                    print("─" * 60)
-                    print(js_code[:300] + "..." if len(js_code) > 300 else js_code)
-                    print("─" * 60)
-
-                    lines = js_code.split('\n')
-                    break
-
-                time.sleep(2)
-                waited += 2
-                if waited % 10 == 0:
-                    print(f"   Still waiting... ({waited}s)")
-
-            if not lines:
-                print("⏱️  Timeout waiting for validation file")
-                print("   Falling back to manual entry...")
-                choice = '3'
-
         if choice == '3':
             print("\nEnter validation JavaScript (type 'END' on new line when done):\n")
             while True:
-                line = input()
+                line = await self._ainput()
                 if line.strip() == 'END':
                     break
                 lines.append(line)
@@ -1052,12 +1808,9 @@ learn from previous attempts, and improve it iteratively.
                     eval_dir = os.path.dirname(self.file_path)
                     verify_js_path = os.path.join(eval_dir, 'verify.js')
 
-                    # Ensure eval directory exists
-                    os.makedirs(eval_dir, exist_ok=True)
-
-                    # Write JavaScript to external file
-                    with open(verify_js_path, 'w') as f:
-                        f.write(js_code)
+                    # Ensure eval directory exists, then write JavaScript to external file
+                    await _ensure_dir(eval_dir)
+                    await asyncio.to_thread(_write_text, verify_js_path, js_code)
 
                     print(f"💾 Saved validation script to: {verify_js_path}")
 
@@ -1075,8 +1828,13 @@ learn from previous attempts, and improve it iteratively.
                     print("✅ Validation saved")
                     validation_saved = True
                 else:
-                    # Test failed - auto-retry with Claude Code
+                    # Test failed - log the error for Claude Code and auto-retry
                     retry_count += 1
+                    await asyncio.to_thread(
+                        _append_text, self.errors_log,
+                        f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Attempt {retry_count}: "
+                        f"{self.last_validation_error}\n"
+                    )
 
                     if retry_count < max_retries:
                         print(f"\n⚠️  Validation test failed. Auto-retrying with Claude Code... ({retry_count}/{max_retries})")
@@ -1091,26 +1849,26 @@ learn from previous attempts, and improve it iteratively.
                         print()
 
                         # Construct the prompt for Claude Code
-                        marker_file = f"{snapshot_dir}/CLAUDE_REQUEST.md"
-                        claude_prompt = f"Read @{marker_file} and fix the validation JavaScript in {validation_file}. The previous attempt failed - analyze the error and fix it. Test it on both tabs as instructed."
+                        claude_prompt = (
+                            f"Read @{marker_file} and fix the validation JavaScript in "
+                            f"{validation_file}. The previous attempt failed - the errors from "
+                            f"earlier attempts are in @{self.errors_log}. Analyze them and fix "
+                            f"the code. Test it on both tabs as instructed."
+                        )
 
                         try:
-                            # Call Claude Code CLI with --dangerously-skip-permissions for auto-accept
-                            result = subprocess.run(
-                                ['claude', '--dangerously-skip-permissions', claude_prompt],
-                                cwd=os.getcwd(),
-                                capture_output=True,
-                                text=True,
-                                timeout=300  # 5 minute timeout
+                            result, session_id = await self._run_claude(
+                                claude_prompt, claude_session_id
                             )
+                            claude_session_id = session_id or claude_session_id
 
                             print("Claude Code output:")
-                            print("─" * 60)
+                            print(RULE)
                             print(result.stdout)
                             if result.stderr:
                                 print("Errors:")
                                 print(result.stderr)
-                            print("─" * 60)
+                            print(RULE)
                             print()
 
                             # Check if verify.js was updated
@@ -1120,19 +1878,13 @@ learn from previous attempts, and improve it iteratively.
                                     js_code = f.read().strip()
 
                                 # Clean up if it has markdown code blocks
-                                if js_code.startswith('```'):
-                                    lines_raw = js_code.split('\n')
-                                    if lines_raw[0].startswith('```'):
-                                        lines_raw = lines_raw[1:]
-                                    if lines_raw[-1].startswith('```'):
-                                        lines_raw = lines_raw[:-1]
-                                    js_code = '\n'.join(lines_raw).strip()
+                                js_code = _strip_code_fences(js_code)
 
                                 print()
                                 print("📝 Loaded updated validation code:")
-                                print("─" * 60)
+                                print(RULE)
                                 print(js_code[:200] + "..." if len(js_code) > 200 else js_code)
-                                print("─" * 60)
+                                print(RULE)
                                 print()
                                 print("🔄 Re-testing with updated code...")
                                 # Continue to next iteration (retry_count already incremented)
@@ -1157,24 +1909,37 @@ learn from previous attempts, and improve it iteratively.
         else:
             print("⚠️  No validation code entered")
 
+        return True
+
     async def _test_validation(self, js_code: str) -> bool:
-        """Test validation JavaScript."""
+        """
+        Test validation JavaScript, recording the failure reason in
+        self.last_validation_error.
+        """
+        self.last_validation_error = None
+        error = precheck_validation_js(js_code)
+        if error:
+            self.last_validation_error = f"JS Error: {error}"
+            print(f"❌ {self.last_validation_error}")
+            return False
+
         try:
-            resp = requests.post(
-                f"{self.api_base}/page/execute",
+            resp = await self._api(
+                'POST', '/page/execute',
                 json={
                     "clientId": self.client_id,
                     "tabId": self.tab_id,
                     "expression": js_code,
                     "returnByValue": True
                 },
-                timeout=5
+                timeout=(API_CONNECT_TIMEOUT, 5)
             )
             resp.raise_for_status()
             result = resp.json()
 
             if result.get('exceptionDetails'):
-                print(f"❌ JS Error: {result['exceptionDetails']}")
+                self.last_validation_error = f"JS Error: {result['exceptionDetails']}"
+                print(f"❌ {self.last_validation_error}")
                 return False
 
             # Handle different response formats
@@ -1188,11 +1953,13 @@ learn from previous attempts, and improve it iteratively.
                 print(f"✅ Returned: {value}")
                 return True
             else:
-                print(f"❌ Unexpected response format: {result}")
+                self.last_validation_error = f"Unexpected response format: {result}"
+                print(f"❌ {self.last_validation_error}")
                 return False
 
         except Exception as e:
-            print(f"❌ Test failed: {e}")
+            self.last_validation_error = f"Test failed: {e}"
+            print(f"❌ {self.last_validation_error}")
             return False
 
     def _auto_generate_validation(self, added: list, removed: list) -> str:
@@ -1219,59 +1986,42 @@ return true;"""
         """Step 8: Save complete eval file."""
         print("\n💾 Step 8: Save File\n")
 
-        # Fill in defaults
-        if 'enabled' not in self.eval_data:
-            self.eval_data['enabled'] = True
-        if 'tool' not in self.eval_data:
-            self.eval_data['tool'] = 'action_agent'
-        if 'timeout' not in self.eval_data:
-            self.eval_data['timeout'] = 60000
-        if 'target' not in self.eval_data:
-            self.eval_data['target'] = {}
-        if 'wait_for' not in self.eval_data['target']:
-            self.eval_data['target']['wait_for'] = 'networkidle'
-        if 'wait_timeout' not in self.eval_data['target']:
-            self.eval_data['target']['wait_timeout'] = 5000
-
-        # Preview
-        print("Preview:")
-        print("─" * 60)
-        preview = yaml.dump(self.eval_data, default_flow_style=False, sort_keys=False)
-        print(preview)
-        print("─" * 60)
-
-        confirm = input("\nSave? (y/n): ").strip().lower()
+        # Fill in defaults. setdefault keeps existing keys in place, so the saved
+        # YAML preserves the original field order.
+        for key, value in EVAL_DEFAULTS.items():
+            self.eval_data.setdefault(key, value)
+        target = self.eval_data.setdefault('target', {})
+        for key, value in EVAL_TARGET_DEFAULTS.items():
+            target.setdefault(key, value)
+
+        # Preview (one write for the whole block)
+        preview = yaml.dump(
+            self.eval_data, Dumper=SafeDumper, default_flow_style=False, sort_keys=False
+        )
+        sys.stdout.write(''.join(("Preview:\n", RULE, "\n", preview, "\n", RULE, "\n")))
+
+        confirm = (await self._ainput("\nSave? (y/n): ")).strip().lower()
         if confirm == 'y':
-            os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
-            with open(self.file_path, 'w') as f:
-                yaml.dump(self.eval_data, f, default_flow_style=False, sort_keys=False)
+            await _ensure_dir(os.path.dirname(self.file_path))
+            # Write exactly what was previewed rather than serializing a second time
+            await asyncio.to_thread(_write_text, self.file_path, preview)
             print(f"✅ Saved: {self.file_path}")
         else:
             print("❌ Not saved")
 
-    def _prompt_field(self, prompt: str, current: str) -> str:
+    async def _prompt_field(self, prompt: str, current: str) -> str:
         """Prompt for field value."""
         if current:
             print(f"{prompt}")
             print(f"  Current: {current}")
-            value = input("  New (Enter to keep): ").strip()
+            value = (await self._ainput("  New (Enter to keep): ")).strip()
             return value if value else current
         else:
-            return input(f"{prompt}: ").strip()
+            return (await self._ainput(f"{prompt}: ")).strip()
 
     def _empty_template(self) -> dict:
-        """Empty template."""
-        return {
-            'id': '',
-            'name': '',
-            'description': '',
-            'enabled': True,
-            'target': {'url': '', 'wait_for': 'networkidle', 'wait_timeout': 5000},
-            'tool': 'action_agent',
-            'timeout': 60000,
-            'input': {'objective': ''},
-            'validation': {'type': 'js-eval', 'js-eval': {'script': '', 'expected_result': True, 'timeout': 5000}}
-        }
+        """Empty template (a fresh copy - the builder fills it in place)."""
+        return copy.deepcopy(EMPTY_EVAL_TEMPLATE)
 
     # ========================================================================
     # EXTEND MODE: Refine existing verify.js with additional examples
@@ -1307,8 +2057,8 @@ return true;"""
             print("   Opening temporary tab for baseline capture...")
             url = self.eval_data['target']['url']
             try:
-                resp = requests.post(
-                    f"{self.api_base}/tabs/open",
+                resp = await self._api(
+                    'POST', '/tabs/open',
                     json={"clientId": self.client_id, "url": url, "background": False},
                     timeout=10
                 )
@@ -1320,7 +2070,7 @@ return true;"""
 
                 # Capture baseline using the temporary tab
                 self.tab_id = baseline_tab_id  # Temporarily set for _capture_dom_snapshot
-                baseline_snapshot = self._capture_dom_snapshot("BASELINE")
+                baseline_snapshot = await self._capture_dom_snapshot("BASELINE")
                 if baseline_snapshot:
                     self.example_manager.save_baseline(self.client_id, baseline_tab_id, baseline_snapshot)
                     print(f"✅ Baseline saved")
@@ -1357,7 +2107,8 @@ return true;"""
             print(f"📊 Current examples: {pos_count} positive, {neg_count} negative")
         print()
 
-        choice = input("Add [P]ositive example, [N]egative example, or [Q]uit? ").strip().lower()
+        choice = await self._ainput("Add [P]ositive example, [N]egative example, or [Q]uit? ")
+        choice = choice.strip().lower()
 
         if choice == 'q':
             return False
@@ -1374,8 +2125,8 @@ return true;"""
         print(f"\n🌐 Opening new tab for {example_type} example...")
         url = self.eval_data['target']['url']
         try:
-            resp = requests.post(
-                f"{self.api_base}/tabs/open",
+            resp = await self._api(
+                'POST', '/tabs/open',
                 json={"clientId": self.client_id, "url": url, "background": False},
                 timeout=10
             )
@@ -1396,18 +2147,18 @@ return true;"""
         else:
             print("   This state should FAIL verification (verify.js should return FALSE)")
         print()
-        input("Press Enter when the page is in the desired state...")
+        await self._ainput("Press Enter when the page is in the desired state...")
 
         # Test current verify.js
-        verify_js_path = os.path.join(self.workdir, 'verify.js')
-        with open(verify_js_path, 'r') as f:
+        with open(self.verify_js_path, 'r') as f:
             js_code = f.read()
 
+        # Test current verify.js and capture the snapshot for this example together
         print(f"\n🧪 Testing current verify.js on this {example_type} example...")
-        actual_result = await self._execute_js_on_tab(js_code, example_tab_id)
-
-        # Capture snapshot for this example
-        current_snapshot = self._capture_dom_snapshot_for_tab(example_tab_id, "EXAMPLE")
+        actual_result, current_snapshot = await asyncio.gather(
+            self._execute_js_on_tab(js_code, example_tab_id),
+            self._capture_dom_snapshot_for_tab(example_tab_id, "EXAMPLE")
+        )
         if current_snapshot:
             changes = self._compare_snapshots(baseline_snapshot, current_snapshot)
         else:
@@ -1452,6 +2203,9 @@ return true;"""
                                             changes: List, example_tab_id: str) -> bool:
         """Adjust verify.js with auto-retry and regression testing. Max 3 attempts."""
 
+        # Attempts for this example share one conversation; other examples start fresh
+        claude_session_id = None
+
         for attempt in range(1, 4):
             print(f"\n🔄 Adjustment attempt {attempt}/3...")
 
@@ -1467,18 +2221,13 @@ return true;"""
             )
 
             # Call Claude Code
-            marker_file = os.path.join(self.workdir, 'CLAUDE_EXTEND_REQUEST.md')
-            verify_js_path = os.path.join(self.workdir, 'verify.js')
+            marker_file = self.extend_request_file
+            verify_js_path = self.verify_js_path
             claude_prompt = f"Read @{marker_file} and adjust verify.js to handle the {example_type} example. Save to {verify_js_path}."
 
             try:
-                result = subprocess.run(
-                    ['claude', '--dangerously-skip-permissions', claude_prompt],
-                    cwd=os.getcwd(),
-                    capture_output=True,
-                    text=True,
-                    timeout=300
-                )
+                result, session_id = await self._run_claude(claude_prompt, claude_session_id)
+                claude_session_id = session_id or claude_session_id
                 print("Claude Code output:")
                 print("-" * 40)
                 output = result.stdout
@@ -1526,18 +2275,26 @@ return true;"""
         all_passed = True
         results = []
 
-        for example in examples:
-            tab_id = example['tab_id']
-            expected = example['expected_result']
+        # Each example lives in its own tab, so executions can be in flight at once -
+        # at most one per pooled connection, so large example sets don't flood the server
+        limit = asyncio.Semaphore(API_POOL_MAXSIZE)
+
+        async def execute(example: Dict[str, Any]) -> Tuple[Optional[bool], Optional[str]]:
+            async with limit:
+                return await self._execute_js_on_tab_with_error(js_code, example['tab_id'])
+
+        print(f"  Testing {len(examples)} example(s)...")
+        actuals = await asyncio.gather(*(execute(example) for example in examples))
 
-            print(f"  Testing {example['id']}...", end=" ")
-            actual = await self._execute_js_on_tab(js_code, tab_id)
+        for example, (actual, error) in zip(examples, actuals):
+            expected = example['expected_result']
 
+            print(f"  {example['id']}:", end=" ")
             if actual == expected:
                 print(f"✅ (expected {expected}, got {actual})")
                 results.append((example['id'], True))
             else:
-                print(f"❌ (expected {expected}, got {actual})")
+                print(f"❌ (expected {expected}, got {actual})" + (f" - {error}" if error else ""))
                 results.append((example['id'], False))
                 all_passed = False
 
@@ -1549,38 +2306,53 @@ return true;"""
 
     async def _execute_js_on_tab(self, js_code: str, tab_id: str) -> Optional[bool]:
         """Execute JavaScript on specific tab and return boolean result."""
+        value, error = await self._execute_js_on_tab_with_error(js_code, tab_id)
+        if error:
+            print(f"❌ {error}")
+        return value
+
+    async def _execute_js_on_tab_with_error(
+        self, js_code: str, tab_id: str
+    ) -> Tuple[Optional[bool], Optional[str]]:
+        """
+        Execute JavaScript on specific tab without printing.
+
+        Returns:
+            (result, error): error is a message when execution failed, so callers
+            running several tabs at once can report it next to the right tab
+        """
         try:
-            resp = requests.post(
-                f"{self.api_base}/page/execute",
+            resp = await self._api(
+                'POST', '/page/execute',
                 json={
                     "clientId": self.client_id,
                     "tabId": tab_id,
                     "expression": js_code,
                     "returnByValue": True
                 },
-                timeout=5
+                timeout=(API_CONNECT_TIMEOUT, 5)
             )
             resp.raise_for_status()
             result = resp.json()
 
             if result.get('exceptionDetails'):
-                print(f"❌ JS Error: {result['exceptionDetails']}")
-                return None
+                return None, f"JS Error: {result['exceptionDetails']}"
 
             # Handle different response formats
             if isinstance(result.get('result'), dict):
-                return result['result'].get('value')
-            return result.get('result')
+                return result['result'].get('value'), None
+            return result.get('result'), None
         except Exception as e:
-            print(f"❌ Execution error: {e}")
-            return None
+            return None, f"Execution error: {e}"
 
-    def _capture_dom_snapshot_for_tab(self, tab_id: str, label: str) -> Optional[Dict[str, Any]]:
+    async def _capture_dom_snapshot_for_tab(
+        self, tab_id: str, label: str
+    ) -> Optional[Dict[str, Any]]:
         """Capture DOM snapshot for a specific tab."""
         try:
             print(f"📸 Capturing DOM snapshot ({label}) for tab {tab_id[:8]}...")
-            resp = requests.post(
-                f"{self.api_base}/page/dom-snapshot",
+            result = await self._api_json(
+                'POST', '/page/dom-snapshot',
                 json={
                     "clientId": self.client_id,
                     "tabId": tab_id,
@@ -1589,8 +2361,6 @@ return true;"""
                 },
                 timeout=10
             )
-            resp.raise_for_status()
-            result = resp.json()
             snapshot = result.get('snapshot')
             if snapshot:
                 num_strings = len(snapshot.get('strings', []))
@@ -1601,8 +2371,18 @@ return true;"""
             return None
 
     def _compare_snapshots(self, snapshot_before: Dict[str, Any], snapshot_after: Dict[str, Any]) -> List:
-        """Compare two DOM snapshots and return changes."""
-        tree_before = build_enhanced_tree(snapshot_before, filters=DEFAULT_FILTERS)
+        """
+        Compare two DOM snapshots and return changes.
+
+        In extend mode every example is compared against the same baseline snapshot,
+        so the tree built for snapshot_before is kept and reused while the same
+        snapshot object is passed in.
+        """
+        if self._baseline_tree is not None and self._baseline_tree[0] is snapshot_before:
+            tree_before = self._baseline_tree[1]
+        else:
+            tree_before = build_enhanced_tree(snapshot_before, filters=DEFAULT_FILTERS)
+            self._baseline_tree = (snapshot_before, tree_before)
         tree_after = build_enhanced_tree(snapshot_after, filters=DEFAULT_FILTERS)
         if not tree_before or not tree_after:
             return []
@@ -1613,9 +2393,9 @@ return true;"""
                                changes: List, example_tab_id: str, attempt: int):
         """Create CLAUDE_EXTEND_REQUEST.md for Claude Code."""
 
-        verify_js_path = os.path.join(self.workdir, 'verify.js')
-        changes_file = os.path.join(self.workdir, 'examples', example_id, 'changes.json')
-        marker_file = os.path.join(self.workdir, 'CLAUDE_EXTEND_REQUEST.md')
+        verify_js_path = self.verify_js_path
+        changes_file = os.path.join(self.example_manager.examples_dir, example_id, 'changes.json')
+        marker_file = self.extend_request_file
 
         # Get all examples for context
         all_examples = self.example_manager.get_all_examples()
@@ -1689,6 +2469,14 @@ async def main():
     parser.add_argument('--workdir', '-w', required=True, help='Working directory for snapshots and validation scripts')
     parser.add_argument('--disable-filtering', action='store_true', help='Disable HTML cleaning (keep raw HTML with scripts/styles)')
     parser.add_argument('--extend', '-e', action='store_true', help='Force extend mode (requires existing verify.js)')
+    parser.add_argument('--reuse-snapshot', action='store_true',
+                        help=f'Cache the BEFORE HTML and reuse it for this URL if younger '
+                             f'than {SNAPSHOT_CACHE_MAX_AGE // 60} minutes. before.html/diff.json '
+                             f'then come from that earlier capture, while before.json is '
+                             f'always captured fresh')
+    parser.add_argument('--no-html-artifacts', action='store_true',
+                        help='Skip the HTML reference capture, before/after.html and '
+                             'diff.json (changes.json only)')
     args = parser.parse_args()
 
     # Normalize workdir path (strip 'evals/' prefix if present and we're already in evals/)
@@ -1703,31 +2491,45 @@ async def main():
     # Auto-detect task.yaml or task.yml in workdir if no file specified
     file_path = args.file
     if not file_path:
-        # Check for both .yaml and .yml extensions
+        # Check for both .yaml and .yml extensions with a single directory listing
         task_yaml_path = os.path.join(workdir, 'task.yaml')
         task_yml_path = os.path.join(workdir, 'task.yml')
+        try:
+            with os.scandir(workdir) as it:
+                workdir_entries = {entry.name for entry in it}
+        except (FileNotFoundError, NotADirectoryError):
+            workdir_entries = set()
 
-        if os.path.exists(task_yaml_path):
+        if 'task.yaml' in workdir_entries:
             file_path = task_yaml_path
             print(f"📋 Found existing task.yaml: {file_path}")
-        elif os.path.exists(task_yml_path):
+        elif 'task.yml' in workdir_entries:
             file_path = task_yml_path
             print(f"📋 Found existing task.yml: {file_path}")
         else:
             file_path = task_yaml_path  # Will be created as new file
             print(f"📝 Will create new task.yaml: {file_path}")
 
-    builder = SnapshotBasedEvalBuilder(file_path=file_path, workdir=workdir, disable_filtering=args.disable_filtering)
+    builder = SnapshotBasedEvalBuilder(
+        file_path=file_path,
+        workdir=workdir,
+        disable_filtering=args.disable_filtering,
+        reuse_snapshot=args.reuse_snapshot,
+        html_artifacts=not args.no_html_artifacts
+    )
 
-    # Check --extend flag
-    if args.extend:
-        verify_js_path = os.path.join(workdir, 'verify.js')
-        if not os.path.exists(verify_js_path):
-            print(f"❌ --extend requires existing verify.js at {verify_js_path}")
-            sys.exit(1)
-        await builder.run_extend()
-    else:
-        await builder.run()
+    try:
+        # Check --extend flag
+        if args.extend:
+            verify_js_path = os.path.join(workdir, 'verify.js')
+            if not os.path.exists(verify_js_path):
+                print(f"❌ --extend requires existing verify.js at {verify_js_path}")
+                sys.exit(1)
+            await builder.run_extend()
+        else:
+            await builder.run()
+    finally:
+        builder.close()
 
 
 if __name__ == '__main__':
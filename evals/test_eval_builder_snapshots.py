@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the offline helpers in eval_builder_snapshots.py.
+
+Covers the element-level HTML diff, the HTML cleaner, validation JS
+prechecks, code fence stripping and the YAML cache. No browser or API
+server is needed.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add this directory to path to import eval_builder_snapshots
+sys.path.insert(0, str(Path(__file__).parent))
+
+import eval_builder_snapshots as ebs
+
+
+def _diff(before_html: str, after_html: str) -> list:
+    """Run _dom_diff_files on two HTML strings."""
+    with tempfile.TemporaryDirectory() as tmp:
+        before_path = os.path.join(tmp, 'before.html')
+        after_path = os.path.join(tmp, 'after.html')
+        with open(before_path, 'w', encoding='utf-8') as f:
+            f.write(before_html)
+        with open(after_path, 'w', encoding='utf-8') as f:
+            f.write(after_html)
+        return ebs._dom_diff_files(before_path, after_path)
+
+
+def test_diff_identical_documents():
+    """Identical documents are pruned at the root and produce no records."""
+    html = '<div id="app"><ul><li>1</li><li>2</li></ul><p class="x">text</p></div>'
+    assert _diff(html, html) == []
+
+
+def test_diff_removed_middle_list_item():
+    """Removing one of several look-alike siblings is a single removal."""
+    records = _diff(
+        '<ul><li>1</li><li>2</li><li>3</li></ul>',
+        '<ul><li>1</li><li>3</li></ul>'
+    )
+    assert records == [
+        {'op': '-', 'xpath': '/html/body/ul/li[2]', 'attrs': {}, 'text': '2'}
+    ]
+
+
+def test_diff_inserted_middle_list_item():
+    """Inserting between look-alike siblings is a single addition."""
+    records = _diff(
+        '<ul><li>1</li><li>3</li></ul>',
+        '<ul><li>1</li><li>2</li><li>3</li></ul>'
+    )
+    assert records == [
+        {'op': '+', 'xpath': '/html/body/ul/li[2]', 'attrs': {}, 'text': '2'}
+    ]
+
+
+def test_diff_edited_text_and_attrs():
+    """Matched nodes report only the changed text/attributes as [before, after]."""
+    records = _diff(
+        '<div><p class="a b" title="t">old</p></div>',
+        '<div><p class="a b" title="u">new</p></div>'
+    )
+    assert records == [{
+        'op': '~',
+        'xpath': '/html/body/div/p',
+        'attrs': {'title': ['t', 'u']},
+        'text': ['old', 'new']
+    }]
+
+
+def test_diff_document_order():
+    """Records come out in document order, edits inside earlier siblings first."""
+    records = _diff(
+        '<div><section><p>a</p></section><span>b</span></div>',
+        '<div><section><p>A</p></section><span>b</span><i>c</i></div>'
+    )
+    assert [(r['op'], r['xpath']) for r in records] == [
+        ('~', '/html/body/div/section/p'),
+        ('+', '/html/body/div/i'),
+    ]
+
+
+def test_diff_identity_attrs_never_pair():
+    """Nodes with a different id are reported as removed + added, not edited."""
+    records = _diff('<div><p id="a">x</p></div>', '<div><p id="b">x</p></div>')
+    assert [(r['op'], r['xpath']) for r in records] == [
+        ('+', '/html/body/div/p'),
+        ('-', '/html/body/div/p'),
+    ]
+
+
+def test_diff_earliest_equal_candidate_wins():
+    """Among equally similar unaligned candidates the earliest one is paired."""
+    records = _diff(
+        '<div><p class="a">x</p><p class="a">x</p></div>',
+        '<div><p class="a b">x</p></div>'
+    )
+    assert [(r['op'], r['xpath']) for r in records] == [
+        ('~', '/html/body/div/p'),
+        ('-', '/html/body/div/p[2]'),
+    ]
+
+
+def test_diff_ignores_scripts():
+    """Script changes never show up in the diff."""
+    assert _diff(
+        '<div><script>var a = 1;</script><p>x</p></div>',
+        '<div><script>var a = 2;</script><p>x</p></div>'
+    ) == []
+
+
+def test_filter_html_tags_matches_cleaner():
+    """filter_html_tags reproduces lxml.html.clean.Cleaner output (as used at baseline)."""
+    cases = {
+        '<image src="a.png">': '<img src="a.png">',
+        '<div><image src="a.png"></div>': '<div><img src="a.png"></div>',
+        '<p onclick="x" style="a">hi<script>1</script></p>': '<p>hi</p>',
+        '<a href="javascript:alert(1)">x</a>': '<a href="">x</a>',
+        '<div><foo>t</foo><iframe src="y">z</iframe></div>': '<div>tz</div>',
+        '<html><head><title>T</title></head><body><form><input name=q></form></body></html>':
+            '<div>T<body><form><input name="q"></form></body></div>',
+        '<script>x</script>': '<div></div>',
+        '<!-- c --><div>a</div>': '<div>a</div>',
+    }
+    for html, expected in cases.items():
+        assert ebs.filter_html_tags(html) == expected, html
+
+
+def test_precheck_rejects_nested_top_level_return():
+    """A return outside any function is rejected, however deeply it is nested."""
+    if not ebs.ESPRIMA_AVAILABLE:
+        print("⏭️  esprima not installed, skipping")
+        return
+    for js in (
+        'return true;',
+        'if (document.title) { return true; }',
+        'for (const el of []) { while (true) { return false; } }',
+    ):
+        assert ebs.precheck_validation_js(js), js
+
+
+def test_precheck_accepts_returns_inside_functions():
+    """Returns inside functions, arrows and methods are fine."""
+    if not ebs.ESPRIMA_AVAILABLE:
+        print("⏭️  esprima not installed, skipping")
+        return
+    for js in (
+        '(function() { return true; })()',
+        '(() => { if (1) { return true; } })()',
+        '({ check() { return true; } }).check()',
+        'document.querySelector("input").value === "x"',
+    ):
+        assert ebs.precheck_validation_js(js) is None, js
+
+
+def test_strip_code_fences():
+    """Surrounding markdown fences are removed; unfenced code is left alone."""
+    assert ebs._strip_code_fences('```js\nreturn 1;\n```') == 'return 1;'
+    assert ebs._strip_code_fences('```\na\nb\n```') == 'a\nb'
+    assert ebs._strip_code_fences('```javascript\na\nb') == 'a\nb'
+    assert ebs._strip_code_fences('a === 1') == 'a === 1'
+    assert ebs._strip_code_fences('```') == ''
+
+
+def test_load_yaml_cached():
+    """Cached loads return independent copies and pick up file changes."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'task.yaml')
+        with open(path, 'w') as f:
+            f.write("target:\n  url: https://example.com\n")
+
+        first = ebs.load_yaml_cached(path)
+        first['target']['url'] = 'mutated'
+        assert ebs.load_yaml_cached(path) == {'target': {'url': 'https://example.com'}}
+
+        with open(path, 'w') as f:
+            f.write("target:\n  url: https://example.org/changed\n")
+        assert ebs.load_yaml_cached(path) == {'target': {'url': 'https://example.org/changed'}}
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Eval Builder Helpers Test")
+    print("=" * 60)
+
+    tests = [value for name, value in list(globals().items()) if name.startswith('test_')]
+    try:
+        for test in tests:
+            test()
+            print(f"✅ {test.__name__}")
+
+        print("\n" + "=" * 60)
+        print(f"✅ All {len(tests)} tests passed!")
+        print("=" * 60)
+
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        exit(1)